@@ -1,5 +1,9 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any
 from dotenv import load_dotenv
@@ -8,13 +12,50 @@ import uvicorn
 from src.faiss_index import FAISSIndex
 from src.embeddings import EmbeddingModel
 from src.llm_client import TicketResolutionAssistant
-from src.config import GEMINI_API_KEY, DEFAULT_TOP_K
+from src.config import (
+    GEMINI_API_KEY,
+    DEFAULT_TOP_K,
+    QUERY_BATCH_MAX_SIZE,
+    QUERY_BATCH_MAX_DELAY,
+)
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global faiss_index, embedding_model, ai_assistant, query_queue
+
+    print("Loading FAISS index and embedding model...")
+    faiss_index = FAISSIndex()
+    await asyncio.to_thread(faiss_index.load)
+
+    embedding_model = EmbeddingModel()
+    # The model loads lazily on first use; a warmup encode in a worker
+    # thread pulls the weights in now so the first real request doesn't
+    # pay for them (and doesn't stall the event loop doing it).
+    await asyncio.to_thread(embedding_model.encode_query, "warmup")
+
+    query_queue = asyncio.Queue()
+    batch_task = asyncio.create_task(query_batch_loop(query_queue))
+
+    if GEMINI_API_KEY:
+        print("Initializing AI assistant...")
+        ai_assistant = TicketResolutionAssistant()
+        await asyncio.to_thread(ai_assistant.gemini_client.warmup)
+    else:
+        print("Warning: GEMINI_API_KEY not set. AI recommendations disabled.")
+
+    print("Server ready!")
+    yield
+
+    batch_task.cancel()
+
+
 app = FastAPI(
     title="Ticket Support System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -28,6 +69,69 @@ app.add_middleware(
 faiss_index = None
 embedding_model = None
 ai_assistant = None
+query_queue = None
+
+
+def run_inference(queries: List[str], top_k: int):
+    """Encode a batch of queries and search the index in one pass.
+
+    This is the only place model inference runs in the server; everything
+    funnels through the batching loop, which calls it from a worker
+    thread.
+    """
+    embeddings = embedding_model.encode_queries(queries)
+    return faiss_index.search_batch(embeddings, top_k=top_k)
+
+
+async def query_batch_loop(queue: asyncio.Queue):
+    """Drain concurrent queries into one encode + one FAISS search.
+
+    Each queue item is (query, top_k, future). The loop waits for the
+    first item, then keeps collecting until the batch is full or
+    QUERY_BATCH_MAX_DELAY has passed. The whole batch is encoded in one
+    forward pass and searched with a single (N, d) index.search call, so
+    FAISS runs one GEMM instead of N separate GEMVs. Each future resolves
+    with its own result list, truncated to the requested top_k.
+    """
+    loop = asyncio.get_running_loop()
+
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + QUERY_BATCH_MAX_DELAY
+
+        while len(batch) < QUERY_BATCH_MAX_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        queries = [query for query, _, _ in batch]
+        max_top_k = max(top_k for _, top_k, _ in batch)
+        try:
+            # One worker thread runs the whole model+index pass; the event
+            # loop stays free to accept (and enqueue) new requests, which
+            # is what fills the next batch.
+            batch_results = await asyncio.to_thread(
+                run_inference, queries, max_top_k
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        for (_, top_k, future), results in zip(batch, batch_results):
+            if not future.done():
+                future.set_result(results[:top_k])
+
+
+async def search_query(query: str, top_k: int):
+    future = asyncio.get_running_loop().create_future()
+    await query_queue.put((query, top_k, future))
+    return await future
 
 
 class SearchRequest(BaseModel):
@@ -59,37 +163,14 @@ class AIRecommendationResponse(BaseModel):
     backend: str
 
 
-@app.on_event("startup")
-async def startup_event():
-    global faiss_index, embedding_model, ai_assistant
-    
-    print("Loading FAISS index and embedding model...")
-    faiss_index = FAISSIndex()
-    faiss_index.load()
-    
-    embedding_model = EmbeddingModel()
-    
-    if GEMINI_API_KEY:
-        print("Initializing AI assistant...")
-        ai_assistant = TicketResolutionAssistant()
-    else:
-        print("Warning: GEMINI_API_KEY not set. AI recommendations disabled.")
-    
-    print("Server ready!")
-
-
 @app.post("/search", response_model=SearchResponse)
 async def search(request: SearchRequest):
     if not faiss_index or not embedding_model:
         raise HTTPException(status_code=503, detail="Search index not loaded")
     
     try:
-        results = faiss_index.query(
-            request.query,
-            embedding_model=embedding_model,
-            top_k=request.top_k
-        )
-        
+        results = await search_query(request.query, request.top_k)
+
         return SearchResponse(
             query=request.query,
             results=[TicketResult(**r) for r in results],
@@ -111,13 +192,9 @@ async def get_recommendation(request: AIRecommendationRequest):
         raise HTTPException(status_code=503, detail="Search index not loaded")
     
     try:
-        similar_tickets = faiss_index.query(
-            request.query,
-            embedding_model=embedding_model,
-            top_k=request.top_k
-        )
-        
-        recommendation = ai_assistant.generate_recommendation(
+        similar_tickets = await search_query(request.query, request.top_k)
+
+        recommendation = await ai_assistant.generate_recommendation_async(
             request.query,
             similar_tickets
         )
@@ -132,6 +209,25 @@ async def get_recommendation(request: AIRecommendationRequest):
         raise HTTPException(status_code=500, detail=f"Recommendation failed: {str(e)}")
 
 
+@app.post("/recommend/stream")
+async def stream_recommendation(request: AIRecommendationRequest):
+    if not ai_assistant:
+        raise HTTPException(
+            status_code=503,
+            detail="AI assistant not available. Please set GEMINI_API_KEY."
+        )
+
+    if not faiss_index or not embedding_model:
+        raise HTTPException(status_code=503, detail="Search index not loaded")
+
+    similar_tickets = await search_query(request.query, request.top_k)
+
+    return StreamingResponse(
+        ai_assistant.stream_recommendation_async(request.query, similar_tickets),
+        media_type="text/plain"
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "server:app",
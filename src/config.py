@@ -10,20 +10,85 @@ DATA_DIR = PROJECT_ROOT / "Data"
 OLD_TICKETS_DIR = DATA_DIR / "old_tickets"
 PROCESSED_DIR = DATA_DIR / "old_tickets_processed"
 
-UNIFIED_CSV_PATH = PROCESSED_DIR / "old_tickets_unified.csv"
+UNIFIED_CSV_PATH = PROCESSED_DIR / "old_tickets_unified.csv"  # legacy store
+UNIFIED_FEATHER_PATH = PROCESSED_DIR / "old_tickets_unified.feather"
 DOCUMENTS_JSONL_PATH = PROCESSED_DIR / "old_tickets_documents.jsonl"
 FAISS_INDEX_PATH = PROCESSED_DIR / "faiss_index.flat"
-FAISS_IDS_PATH = PROCESSED_DIR / "faiss_ids.npy"
+FAISS_IDS_PATH = PROCESSED_DIR / "faiss_ids.feather"
 FAISS_META_PATH = PROCESSED_DIR / "faiss_meta.jsonl"
 
 EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 EMBEDDING_DIMENSION = 384
 EMBEDDING_BATCH_SIZE = 128
 
+# "torch" runs the stock SentenceTransformer; "onnx" exports the model via
+# optimum/onnxruntime with int8 dynamic quantization (requires the optional
+# optimum[onnxruntime] dependency) and falls back to torch if unavailable.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Run the torch backend in FP16 when a GPU is available (halves weight
+# memory and uses tensor cores); has no effect on CPU.
+EMBEDDING_USE_FP16 = os.getenv("EMBEDDING_USE_FP16", "1") != "0"
+ONNX_MODEL_DIR = PROCESSED_DIR / "onnx_model"
+# "ct2" runs the encoder through CTranslate2 with int8 weights (requires
+# the optional ctranslate2 dependency); the model is converted once into
+# CT2_MODEL_DIR and reused.
+CT2_MODEL_DIR = PROCESSED_DIR / "ct2_model"
+
+# IVF+PQ is only worth it once the corpus is large enough to train the
+# coarse quantizer; below this size a flat index is both faster and exact.
+FAISS_IVF_MIN_VECTORS = 10_000
+FAISS_PQ_SUBQUANTIZERS = 32
+FAISS_PQ_BITS = 8
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+# 0 = auto: one OpenMP thread per physical core. Hyperthread siblings
+# share the SIMD units, so oversubscribing them only adds contention.
+FAISS_NUM_THREADS = int(os.getenv("FAISS_NUM_THREADS", "0"))
+# Same policy for torch's intra-op pool in the embedding path.
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+# mmap the index file instead of reading it into the heap: startup stops
+# paying a full copy, pages load on demand and are shared across workers.
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") != "0"
+
 DEFAULT_TOP_K = 5
+# Hard cap on how many candidates go into the LLM prompt regardless of
+# what the caller retrieved — every extra candidate costs input tokens
+# and latency with little recommendation benefit beyond this point.
+MAX_PROMPT_CANDIDATES = 10
+
+# Repeat queries (retries, the search box then "recommend" on the same
+# text) skip the model entirely via a small LRU of query embeddings.
+QUERY_CACHE_SIZE = 256
+
+# Dynamic batching of concurrent /search and /recommend queries: collect
+# requests for up to this many seconds (or until the batch is full) so the
+# tokenizer+forward overhead amortizes across the batch.
+QUERY_BATCH_MAX_SIZE = 32
+QUERY_BATCH_MAX_DELAY = 0.01
 
 GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME")
+# "grpc" keeps one multiplexed HTTP/2 channel open across requests;
+# "rest" is available for networks that block gRPC.
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT", "grpc")
+# Cap on concurrent Gemini requests: keeps bursty traffic inside the
+# account's rate limits by queueing excess calls instead of erroring.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+# Ask Gemini for compact JSON instead of the Markdown template: the
+# structured system prompt is a fraction of the size and the model stops
+# spending output tokens on prose scaffolding. The server still renders
+# Markdown from the parsed fields for the web client.
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "0") != "0"
+# LLM call telemetry (latency, prompt/response sizes) is queued and
+# flushed to a JSONL file by a background thread so requests never block
+# on logging I/O. LLM_TELEMETRY=0 disables it.
+LLM_TELEMETRY = os.getenv("LLM_TELEMETRY", "1") != "0"
+LLM_TELEMETRY_PATH = PROCESSED_DIR / "llm_telemetry.jsonl"
+LLM_TELEMETRY_BATCH_SIZE = 64
+LLM_TELEMETRY_FLUSH_INTERVAL = 2.0
+
+# Identical query + identical candidate set means an identical prompt, so
+# the LLM answer can be replayed from a small LRU instead of re-billed.
+LLM_CACHE_SIZE = 128
 
 REQUIRED_COLUMNS = [
     "ticket_id",
@@ -1,27 +1,202 @@
+import os
+
 import numpy as np
+from collections import OrderedDict
+from pathlib import Path
 from typing import List
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
-from src.config import EMBEDDING_MODEL_NAME, EMBEDDING_BATCH_SIZE
+from src.config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BACKEND,
+    EMBEDDING_USE_FP16,
+    TORCH_NUM_THREADS,
+    ONNX_MODEL_DIR,
+    CT2_MODEL_DIR,
+    QUERY_CACHE_SIZE,
+)
+
+
+class ONNXEncoder:
+    """Drop-in replacement for SentenceTransformer.encode backed by
+    onnxruntime with int8 dynamic quantization.
+
+    The model is exported (and quantized) once into export_dir; later
+    loads reuse the cached ONNX file. Mean pooling and L2 normalization
+    happen in NumPy, so the output matches the torch backend.
+    """
+
+    def __init__(self, model_name: str, export_dir: Path = ONNX_MODEL_DIR):
+        import onnxruntime
+        from transformers import AutoTokenizer
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        export_dir = Path(export_dir)
+        quantized_path = export_dir / "model_quantized.onnx"
+
+        if not quantized_path.exists():
+            print(f"Exporting {model_name} to ONNX (one-time)...")
+            model = ORTModelForFeatureExtraction.from_pretrained(
+                model_name, export=True
+            )
+            model.save_pretrained(export_dir)
+
+            quantizer = ORTQuantizer.from_pretrained(model)
+            quantizer.quantize(
+                save_dir=export_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(
+                    is_static=False
+                ),
+            )
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.session = onnxruntime.InferenceSession(
+            str(quantized_path),
+            providers=["CPUExecutionProvider"],
+        )
+
+    def encode(
+        self,
+        texts: List[str],
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = True,
+    ) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            return_tensors="np",
+        )
+        inputs = {
+            name.name: encoded[name.name].astype("int64")
+            for name in self.session.get_inputs()
+            if name.name in encoded
+        }
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        mask = encoded["attention_mask"][..., None].astype("float32")
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(
+            mask.sum(axis=1), 1e-9, None
+        )
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+
+        return embeddings.astype("float32")
+
+
+class CT2Encoder:
+    """Drop-in replacement for SentenceTransformer.encode backed by a
+    CTranslate2 encoder with int8 weights.
+
+    The HF checkpoint is converted once into model_dir; later loads reuse
+    it. Pooling and normalization mirror the other backends.
+    """
+
+    def __init__(self, model_name: str, model_dir: Path = CT2_MODEL_DIR):
+        import ctranslate2
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        if not (model_dir / "model.bin").exists():
+            print(f"Converting {model_name} to CTranslate2 (one-time)...")
+            from ctranslate2.converters import TransformersConverter
+            TransformersConverter(model_name).convert(
+                str(model_dir), quantization="int8"
+            )
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.encoder = ctranslate2.Encoder(str(model_dir), compute_type="int8")
+
+    def encode(
+        self,
+        texts: List[str],
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = True,
+    ) -> np.ndarray:
+        token_ids = self.tokenizer(texts, truncation=True)["input_ids"]
+        output = self.encoder.forward_batch(token_ids)
+        hidden = np.array(output.last_hidden_state)
+
+        # forward_batch pads to the batch max; mask the padding out of the
+        # mean pool using the true sequence lengths.
+        lengths = np.array([len(ids) for ids in token_ids])
+        mask = (
+            np.arange(hidden.shape[1])[None, :] < lengths[:, None]
+        ).astype("float32")[..., None]
+        embeddings = (hidden * mask).sum(axis=1) / np.clip(
+            mask.sum(axis=1), 1e-9, None
+        )
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+
+        return embeddings.astype("float32")
 
 
 class EmbeddingModel:
-    
+
     def __init__(
         self,
         model_name: str = EMBEDDING_MODEL_NAME,
-        batch_size: int = EMBEDDING_BATCH_SIZE
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        backend: str = EMBEDDING_BACKEND
     ):
         self.model_name = model_name
         self.batch_size = batch_size
-        self._model: SentenceTransformer = None
-        
+        self.backend = backend
+        self._model = None
+        self._query_cache: OrderedDict = OrderedDict()
+
     @property
-    def model(self) -> SentenceTransformer:
+    def model(self):
         if self._model is None:
+            if self.backend == "onnx":
+                try:
+                    print(f"Loading ONNX embedding model: {self.model_name}")
+                    self._model = ONNXEncoder(self.model_name)
+                    return self._model
+                except ImportError:
+                    print(
+                        "Warning: optimum[onnxruntime] not installed, "
+                        "falling back to torch backend."
+                    )
+            elif self.backend == "ct2":
+                try:
+                    print(f"Loading CTranslate2 embedding model: {self.model_name}")
+                    self._model = CT2Encoder(self.model_name)
+                    return self._model
+                except ImportError:
+                    print(
+                        "Warning: ctranslate2 not installed, "
+                        "falling back to torch backend."
+                    )
             print(f"Loading embedding model: {self.model_name}")
-            self._model = SentenceTransformer(self.model_name)
+
+            import torch
+            # Same pinning policy as the FAISS pool: one intra-op thread
+            # per physical core, since hyperthread siblings share the
+            # SIMD units torch's matmuls saturate.
+            torch.set_num_threads(
+                TORCH_NUM_THREADS or max(1, (os.cpu_count() or 1) // 2)
+            )
+
+            model = SentenceTransformer(self.model_name)
+
+            if EMBEDDING_USE_FP16 and torch.cuda.is_available():
+                # FP16 weights halve memory traffic and run on tensor
+                # cores; embeddings still come back as FP32 NumPy. CPU
+                # stays FP32 — without tensor cores FP16 is slower there.
+                model = model.half()
+
+            self._model = model
         return self._model
     
     def encode_texts(
@@ -29,40 +204,80 @@ class EmbeddingModel:
         texts: List[str],
         show_progress: bool = True,
     ) -> np.ndarray:
-        embeddings = []
-        
-        iterator = range(0, len(texts), self.batch_size)
+        # Sort by length so each batch holds similarly sized texts; padding
+        # to the batch max then wastes far fewer tokens. Order is restored
+        # before returning.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+
+        # Preallocated once the first batch reveals the dimension; each
+        # batch writes straight into its slice, avoiding the list growth
+        # and final vstack copy.
+        embeddings = None
+        row = 0
+
+        iterator = range(0, len(sorted_texts), self.batch_size)
         if show_progress:
             iterator = tqdm(iterator, desc="Encoding texts")
-            
+
         for i in iterator:
-            batch = texts[i : i + self.batch_size]
+            batch = sorted_texts[i : i + self.batch_size]
             batch_embeddings = self.model.encode(
                 batch,
                 convert_to_numpy=True,
                 show_progress_bar=False,
                 normalize_embeddings=True,
             )
-            embeddings.append(batch_embeddings)
-        
-        if not embeddings:
+            if embeddings is None:
+                embeddings = np.empty(
+                    (len(sorted_texts), batch_embeddings.shape[1]),
+                    dtype="float32",
+                )
+            embeddings[row : row + len(batch_embeddings)] = batch_embeddings
+            row += len(batch_embeddings)
+
+        if embeddings is None:
             raise ValueError("No embeddings generated")
-            
-        embeddings = np.vstack(embeddings).astype("float32")
 
-            
-        return embeddings
+        unsorted = np.empty_like(embeddings)
+        unsorted[order] = embeddings
+
+        return unsorted
     
+    def encode_queries(
+        self,
+        queries: List[str],
+    ) -> np.ndarray:
+        embeddings = [None] * len(queries)
+        misses, miss_positions = [], []
+
+        for i, query in enumerate(queries):
+            cached = self._query_cache.get(query)
+            if cached is not None:
+                self._query_cache.move_to_end(query)
+                embeddings[i] = cached
+            else:
+                misses.append(query)
+                miss_positions.append(i)
+
+        if misses:
+            fresh = self.model.encode(
+                misses,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+                normalize_embeddings=True,
+            ).astype("float32")
+            for query, i, embedding in zip(misses, miss_positions, fresh):
+                embeddings[i] = embedding
+                self._query_cache[query] = embedding
+                if len(self._query_cache) > QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+
+        return np.array(embeddings, dtype="float32")
+
     def encode_query(
         self,
         query: str,
     ) -> np.ndarray:
-        embedding = self.model.encode(
-            [query],
-            convert_to_numpy=True,
-            show_progress_bar=False,
-            normalize_embeddings=True,
-        )[0].astype("float32")
-     
-        return embedding
+        return self.encode_queries([query])[0]
 
@@ -1,8 +1,11 @@
-import json
+import math
+import os
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
 import numpy as np
 import faiss
+import pyarrow as pa
+import pyarrow.feather
 
 from src.config import (
     FAISS_INDEX_PATH,
@@ -10,9 +13,20 @@ from src.config import (
     FAISS_META_PATH,
     DOCUMENTS_JSONL_PATH,
     DEFAULT_TOP_K,
+    FAISS_IVF_MIN_VECTORS,
+    FAISS_PQ_SUBQUANTIZERS,
+    FAISS_PQ_BITS,
+    FAISS_NPROBE,
+    FAISS_NUM_THREADS,
+    FAISS_MMAP,
 )
 from src.embeddings import EmbeddingModel
 from src.data_processing import load_documents
+from src.json_io import read_jsonl, write_jsonl
+
+faiss.omp_set_num_threads(
+    FAISS_NUM_THREADS or max(1, (os.cpu_count() or 1) // 2)
+)
 
 
 class FAISSIndex:
@@ -58,13 +72,52 @@ class FAISSIndex:
         )
         
         print("Building FAISS index...")
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dimension)
+        self.index = self._create_index(embeddings)
         self.index.add(embeddings)
         self.ids = ids
         self.metadata = metadata
-        
+
         print(f"Index built with {self.index.ntotal} vectors.")
+
+    @staticmethod
+    def _create_index(embeddings: np.ndarray) -> faiss.Index:
+        num_vectors, dimension = embeddings.shape
+
+        if num_vectors < FAISS_IVF_MIN_VECTORS:
+            print(f"Corpus small ({num_vectors} vectors), using int8 flat index.")
+            index = faiss.IndexScalarQuantizer(
+                dimension,
+                faiss.ScalarQuantizer.QT_8bit,
+                faiss.METRIC_INNER_PRODUCT,
+            )
+            index.train(embeddings)
+            return index
+
+        nlist = int(4 * math.sqrt(num_vectors))
+        print(
+            f"Using OPQ+IVF+PQ index (nlist={nlist}, "
+            f"M={FAISS_PQ_SUBQUANTIZERS}, nbits={FAISS_PQ_BITS})"
+        )
+        index = faiss.index_factory(
+            dimension,
+            f"OPQ{FAISS_PQ_SUBQUANTIZERS},"
+            f"IVF{nlist},"
+            f"PQ{FAISS_PQ_SUBQUANTIZERS}x{FAISS_PQ_BITS}",
+            faiss.METRIC_INNER_PRODUCT,
+        )
+
+        print("Training index...")
+        index.train(embeddings)
+
+        return index
+
+    @staticmethod
+    def _set_nprobe(index: faiss.Index, nprobe: int) -> None:
+        try:
+            ivf = faiss.extract_index_ivf(index)
+        except RuntimeError:
+            return  # flat index, nothing to tune
+        ivf.nprobe = nprobe
         
     def save(self) -> None:
         if self.index is None:
@@ -76,14 +129,14 @@ class FAISSIndex:
         faiss.write_index(self.index, str(self.index_path))
         
         print(f"Saving IDs to: {self.ids_path}")
-        np.save(str(self.ids_path), np.array(self.ids, dtype=object))
+        pa.feather.write_feather(
+            pa.table({"id": pa.array(self.ids, type=pa.string())}),
+            str(self.ids_path),
+        )
         
         print(f"Saving metadata to: {self.meta_path}")
-        with open(self.meta_path, "w", encoding="utf-8") as f:
-            for meta in self.metadata:
-                json.dump(meta, f, ensure_ascii=False)
-                f.write("\n")
-        
+        write_jsonl(self.meta_path, self.metadata)
+
         print("Index saved successfully.")
         
     def load(self) -> None:
@@ -94,17 +147,31 @@ class FAISSIndex:
             )
         
         print(f"Loading FAISS index from: {self.index_path}")
-        self.index = faiss.read_index(str(self.index_path))
-        
+        if FAISS_MMAP:
+            try:
+                self.index = faiss.read_index(
+                    str(self.index_path),
+                    faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+                )
+            except RuntimeError:
+                # Not every index type supports mmap'd reads.
+                self.index = faiss.read_index(str(self.index_path))
+        else:
+            self.index = faiss.read_index(str(self.index_path))
+        self._set_nprobe(self.index, FAISS_NPROBE)
+
         print(f"Loading IDs from: {self.ids_path}")
-        self.ids = np.load(str(self.ids_path), allow_pickle=True).tolist()
+        legacy_ids_path = self.ids_path.with_suffix(".npy")
+        if self.ids_path.exists():
+            table = pa.feather.read_table(str(self.ids_path))
+            self.ids = table.column("id").to_pylist()
+        else:
+            # Index built before the Arrow switch.
+            self.ids = np.load(str(legacy_ids_path), allow_pickle=True).tolist()
         
         print(f"Loading metadata from: {self.meta_path}")
-        self.metadata = []
-        with open(self.meta_path, "r", encoding="utf-8") as f:
-            for line in f:
-                self.metadata.append(json.loads(line))
-        
+        self.metadata = read_jsonl(self.meta_path)
+
         print(f"Loaded index with {len(self.ids)} items.")
         
     def search(
@@ -112,29 +179,44 @@ class FAISSIndex:
         query_embedding: np.ndarray,
         top_k: int = DEFAULT_TOP_K
     ) -> List[Dict[str, Any]]:
+        return self.search_batch(query_embedding, top_k=top_k)[0]
+
+    def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = DEFAULT_TOP_K
+    ) -> List[List[Dict[str, Any]]]:
         if self.index is None:
             raise RuntimeError("No index loaded. Call load() first.")
-        
-        if query_embedding.ndim == 1:
-            query_embedding = query_embedding.reshape(1, -1)
-        
-        distances, indices = self.index.search(
-            query_embedding.astype("float32"),
-            top_k
-        )
-        
+
+        query_embeddings = np.asarray(query_embeddings, dtype="float32")
+        if query_embeddings.ndim == 1:
+            query_embeddings = query_embeddings.reshape(1, -1)
+
+        distances, indices = self.index.search(query_embeddings, top_k)
+
+        return [
+            self._collect_results(distances[i], indices[i])
+            for i in range(len(query_embeddings))
+        ]
+
+    def _collect_results(
+        self,
+        distances: np.ndarray,
+        indices: np.ndarray
+    ) -> List[Dict[str, Any]]:
         results = []
-        for score, idx in zip(distances[0], indices[0]):
+        for score, idx in zip(distances, indices):
             if idx < 0 or idx >= len(self.ids):
                 continue
-            
+
             results.append({
                 "id": self.ids[idx],
                 "score": float(score),
                 "metadata": self.metadata[idx],
             })
-        
-        results.sort(key=lambda x: x["score"], reverse=True)
+
+        # FAISS already returns hits in descending score order.
         return results
     
     def query(
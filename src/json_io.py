@@ -0,0 +1,42 @@
+from pathlib import Path
+from typing import Any, Iterable, List
+
+# orjson parses/serializes several times faster than the stdlib; fall back
+# transparently when it is not installed.
+try:
+    import orjson
+
+    def json_loads(data) -> Any:
+        return orjson.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:
+    import json
+
+    def json_loads(data) -> Any:
+        return json.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+BUFFER_SIZE = 1024 * 1024
+
+
+def write_jsonl(path: Path, records: Iterable[Any]) -> None:
+    with open(path, "wb", buffering=BUFFER_SIZE) as f:
+        for record in records:
+            f.write(json_dumps(record))
+            f.write(b"\n")
+
+
+def read_jsonl(path: Path) -> List[Any]:
+    records = []
+    with open(path, "rb", buffering=BUFFER_SIZE) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json_loads(line))
+    return records
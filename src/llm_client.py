@@ -1,9 +1,106 @@
-from typing import List, Dict, Any, Optional
+import asyncio
+import io
+import mmap
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+import numpy as np
 import google.generativeai as genai
 
 
-from src.config import GEMINI_API_KEY, GEMINI_MODEL_NAME
+from src.config import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL_NAME,
+    GEMINI_TRANSPORT,
+    GEMINI_MAX_CONCURRENCY,
+    LLM_CACHE_SIZE,
+    LLM_STRUCTURED_OUTPUT,
+    MAX_PROMPT_CANDIDATES,
+)
+from src.json_io import json_loads
+from src.telemetry import telemetry
+
+
+# The large static prompts live as plain text files next to the code and
+# are mmap'd once at import: multi-process uvicorn workers share the page
+# cache instead of each holding private copies built from literals, and
+# prompt edits don't touch Python source.
+_PROMPTS_DIR = Path(__file__).parent / "prompts"
+
+
+def _load_prompt(name: str) -> str:
+    with open(_PROMPTS_DIR / name, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.read().decode("utf-8")
+
+
+_SYSTEM_PROMPT = _load_prompt("recommendation_system.txt")
+_STRUCTURED_SYSTEM_PROMPT = _load_prompt("recommendation_system_structured.txt")
+
+# OpenAPI-style schema passed with structured-mode requests so the reply
+# shape is pinned server-side instead of relying on the prompt alone.
+_RECOMMENDATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "suggested_approach": {"type": "string"},
+        "steps": {"type": "array", "items": {"type": "string"}},
+        "confidence": {"type": "string", "enum": ["Low", "Medium", "High"]},
+        "confidence_reason": {"type": "string"},
+        "reference": {
+            "type": "object",
+            "properties": {
+                "ticket_id": {"type": "string"},
+                "date": {"type": "string"},
+                "agent_name": {"type": "string"},
+            },
+        },
+        "other_approaches": {"type": "string"},
+    },
+    "required": [
+        "suggested_approach",
+        "steps",
+        "confidence",
+        "confidence_reason",
+        "reference",
+        "other_approaches",
+    ],
+}
+
+
+# One pre-parsed template per candidate row; format_map fills it without
+# re-tokenizing the format string for every row.
+_CANDIDATE_ROW_TEMPLATE = (
+    "\n\n{i}) Ticket: {ticket_id} | "
+    "Similarity: {score:.4f} | "
+    "Date: {date} | "
+    "Resolved: {resolved} | "
+    "Category: {category} | "
+    "Agent: {agent_name} | "
+    "Problem: {problem} | "
+    "Resolution: {resolution}"
+)
+
+_CANDIDATE_ROW_DEFAULTS = {
+    "ticket_id": "N/A",
+    "score": 0,
+    "date": "N/A",
+    "resolved": "Unknown",
+    "category": "N/A",
+    "agent_name": "N/A",
+    "problem": "",
+    "resolution": "",
+}
+
+
+_USER_PROMPT_FOOTER = (
+    "\n\n" + "=" * 70 + "\n"
+    "ANALYZE the tickets above using the system instructions.\n"
+    "Consider similarity scores, resolved status, and dates.\n"
+    "Provide your recommendation in the structured format specified."
+)
 
 
 class GeminiClient:
@@ -22,57 +119,361 @@ class GeminiClient:
             )
         
         self.model_name = model_name
-        genai.configure(api_key=self.api_key)
-        
+        genai.configure(api_key=self.api_key, transport=GEMINI_TRANSPORT)
+        self._models: Dict[Tuple[str, bool], genai.GenerativeModel] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the loop that actually runs the
+        # async calls.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        return self._semaphore
+
+    def warmup(self) -> None:
+        """Open the underlying channel with a tiny count_tokens call so the
+        first real request doesn't pay DNS + TLS + channel setup."""
+        try:
+            genai.GenerativeModel(self.model_name).count_tokens("ping")
+        except Exception as e:
+            print(f"Warning: Gemini warmup failed: {e}")
+
+    def get_model(
+        self,
+        system_instruction: str,
+        json_output: bool = False,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> genai.GenerativeModel:
+        # GenerativeModel construction re-validates the config every call;
+        # the instances are stateless, so reuse one per prompt/mode pair.
+        key = (system_instruction, json_output)
+        model = self._models.get(key)
+        if model is None:
+            generation_config = None
+            if json_output:
+                generation_config = {"response_mime_type": "application/json"}
+                if response_schema is not None:
+                    generation_config["response_schema"] = response_schema
+            model = genai.GenerativeModel(
+                model_name=self.model_name,
+                system_instruction=system_instruction,
+                generation_config=generation_config
+            )
+            self._models[key] = model
+        return model
+
     def create_chat(
         self,
         system_instruction: str,
         history: Optional[List[dict]] = None
     ):
-        model = genai.GenerativeModel(
-            model_name=self.model_name,
-            system_instruction=system_instruction
-        )
+        model = self.get_model(system_instruction)
         return model.start_chat(history=history or [])
     
     def send_message(self, chat, message: str) -> str:
         response = chat.send_message(message)
-    
+
+        return response.text
+
+    async def send_message_async(self, chat, message: str) -> str:
+        response = await chat.send_message_async(message)
+
+        return response.text
+
+    # Single-turn usage doesn't need a chat session: start_chat allocates
+    # history tracking and rewraps the request just to be thrown away.
+    # These call generate_content on the cached model directly.
+    def generate(
+        self,
+        system_instruction: str,
+        message: str,
+        json_output: bool = False,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> str:
+        model = self.get_model(
+            system_instruction,
+            json_output=json_output,
+            response_schema=response_schema,
+        )
+        start = time.perf_counter()
+        response = model.generate_content(message)
+        self._record_call("sync", message, response.text, start)
+
         return response.text
 
+    async def generate_async(
+        self,
+        system_instruction: str,
+        message: str,
+        json_output: bool = False,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> str:
+        model = self.get_model(
+            system_instruction,
+            json_output=json_output,
+            response_schema=response_schema,
+        )
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            response = await model.generate_content_async(message)
+            self._record_call("async", message, response.text, start)
+
+        return response.text
+
+    async def stream_generate_async(self, system_instruction: str, message: str):
+        model = self.get_model(system_instruction)
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            response = await model.generate_content_async(message, stream=True)
+            total_chars = 0
+            async for chunk in response:
+                if chunk.text:
+                    total_chars += len(chunk.text)
+                    yield chunk.text
+            self._record_call("stream", message, "", start, total_chars)
+
+    def _record_call(
+        self,
+        mode: str,
+        message: str,
+        response_text: str,
+        start: float,
+        response_chars: Optional[int] = None
+    ) -> None:
+        telemetry.record({
+            "event": "llm_call",
+            "model": self.model_name,
+            "mode": mode,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "prompt_chars": len(message),
+            "response_chars": (
+                response_chars if response_chars is not None
+                else len(response_text)
+            ),
+        })
+
 
 class TicketResolutionAssistant:
     
     def __init__(self, gemini_client: GeminiClient = None):
         self.gemini_client = gemini_client or GeminiClient()
+        self._response_cache: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _cache_key(
+        query: str,
+        candidates: List[Dict[str, Any]]
+    ) -> Tuple:
+        # Same query against the same candidate set produces the same
+        # prompt; ticket_id + rounded score fingerprints the set.
+        return (
+            query,
+            tuple(
+                (c.get("ticket_id", ""), round(c.get("score", 0.0), 4))
+                for c in candidates
+            ),
+        )
+
+    def _cache_get(self, key: Tuple) -> Optional[str]:
+        response = self._response_cache.get(key)
+        if response is not None:
+            self._response_cache.move_to_end(key)
+        return response
+
+    def _cache_put(self, key: Tuple, response: str) -> None:
+        self._response_cache[key] = response
+        if len(self._response_cache) > LLM_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
         
     def generate_recommendation(
         self,
         query: str,
-        similar_tickets: List[Dict[str, Any]]
+        similar_tickets: List[Dict[str, Any]],
+        max_candidates: int = MAX_PROMPT_CANDIDATES
     ) -> Dict[str, Any]:
-        candidates = self._prepare_candidates(similar_tickets)
-        
+        candidates = self._prepare_candidates(similar_tickets, max_candidates)
+
+        cache_key = self._cache_key(query, candidates)
+        response = self._cache_get(cache_key)
+        if response is None:
+            system_prompt = self._build_system_prompt()
+            user_prompt = self._build_user_prompt(query, candidates)
+
+            response = self.gemini_client.generate(
+                system_prompt, user_prompt,
+                json_output=LLM_STRUCTURED_OUTPUT,
+                response_schema=_RECOMMENDATION_SCHEMA
+            )
+            self._cache_put(cache_key, response)
+
+        return self._build_result(response, candidates)
+
+    async def generate_recommendation_async(
+        self,
+        query: str,
+        similar_tickets: List[Dict[str, Any]],
+        max_candidates: int = MAX_PROMPT_CANDIDATES
+    ) -> Dict[str, Any]:
+        candidates = self._prepare_candidates(similar_tickets, max_candidates)
+
+        cache_key = self._cache_key(query, candidates)
+        response = self._cache_get(cache_key)
+        if response is None:
+            system_prompt = self._build_system_prompt()
+            user_prompt = self._build_user_prompt(query, candidates)
+
+            response = await self.gemini_client.generate_async(
+                system_prompt, user_prompt,
+                json_output=LLM_STRUCTURED_OUTPUT,
+                response_schema=_RECOMMENDATION_SCHEMA
+            )
+            self._cache_put(cache_key, response)
+
+        return self._build_result(response, candidates)
+
+    async def stream_recommendation_async(
+        self,
+        query: str,
+        similar_tickets: List[Dict[str, Any]],
+        max_candidates: int = MAX_PROMPT_CANDIDATES
+    ):
+        """Yield the recommendation text chunk by chunk as Gemini emits it.
+
+        The first tokens reach the agent while the rest are still being
+        generated, so perceived latency drops to time-to-first-token. The
+        full text is cached on completion, and cache hits replay in one
+        chunk.
+        """
+        candidates = self._prepare_candidates(similar_tickets, max_candidates)
+
+        cache_key = self._cache_key(query, candidates)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
         system_prompt = self._build_system_prompt()
         user_prompt = self._build_user_prompt(query, candidates)
-        
-        chat = self.gemini_client.create_chat(system_instruction=system_prompt)
-        response = self.gemini_client.send_message(chat, user_prompt)
-        
-        for candidate in candidates:
-            candidate["_badge"] = self._get_status_badge(
-                candidate.get("resolved")
-            )
-        
-        return {
+
+        pieces = []
+        async for chunk in self.gemini_client.stream_generate_async(
+            system_prompt, user_prompt
+        ):
+            pieces.append(chunk)
+            yield chunk
+
+        self._cache_put(cache_key, "".join(pieces))
+
+    async def generate_recommendations_async(
+        self,
+        requests: List[Tuple[str, List[Dict[str, Any]]]]
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.gather(*(
+            self.generate_recommendation_async(query, similar_tickets)
+            for query, similar_tickets in requests
+        ))
+
+    _RECOMMENDATION_MARKER = "### RECOMMENDATION {n} ###"
+    _RECOMMENDATION_SPLIT_RE = re.compile(r"###\s*RECOMMENDATION\s+\d+\s*###")
+
+    async def generate_recommendations_single_call(
+        self,
+        requests: List[Tuple[str, List[Dict[str, Any]]]],
+        max_candidates: int = MAX_PROMPT_CANDIDATES
+    ) -> List[Dict[str, Any]]:
+        """Answer several incoming tickets with one Gemini call.
+
+        All tickets are marshalled into a single prompt and the model is
+        asked to delimit each answer with a numbered marker, so a batch
+        pays one round-trip and one system-prompt's worth of input tokens
+        instead of N. Falls back to handing everyone the full response if
+        the markers come back malformed.
+        """
+        prepared = [
+            (query, self._prepare_candidates(similar_tickets, max_candidates))
+            for query, similar_tickets in requests
+        ]
+
+        sections = [
+            f"--- INCOMING TICKET {i} ---\n"
+            + self._build_user_prompt(query, candidates)
+            for i, (query, candidates) in enumerate(prepared, start=1)
+        ]
+        prompt = (
+            f"You will receive {len(prepared)} separate incoming tickets. "
+            "Answer each one independently using the system instructions. "
+            "Begin each answer with the exact line "
+            f"'{self._RECOMMENDATION_MARKER.format(n='<ticket number>')}'.\n\n"
+            + "\n\n".join(sections)
+        )
+
+        response = await self.gemini_client.generate_async(
+            self._build_system_prompt(), prompt
+        )
+
+        parts = [
+            part.strip()
+            for part in self._RECOMMENDATION_SPLIT_RE.split(response)
+            if part.strip()
+        ]
+        if len(parts) != len(prepared):
+            parts = [response] * len(prepared)
+
+        return [
+            self._build_result(part, candidates)
+            for part, (_, candidates) in zip(parts, prepared)
+        ]
+
+    def _build_result(
+        self,
+        response: str,
+        candidates: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        result = {
             "llm_output": response,
             "candidates": candidates,
             "backend": f"gemini:{self.gemini_client.model_name}"
         }
+
+        if LLM_STRUCTURED_OUTPUT:
+            try:
+                structured = json_loads(response)
+            except Exception:
+                return result  # model ignored JSON mode; keep raw text
+            if not isinstance(structured, dict):
+                # Valid JSON but not the schema's object (array, bare
+                # string); keep the raw text rather than crash rendering.
+                return result
+            result["llm_output"] = self._render_structured(structured)
+            result["llm_output_structured"] = structured
+
+        return result
+
+    @staticmethod
+    def _render_structured(data: Dict[str, Any]) -> str:
+        # Rebuild the Markdown layout the web client expects from the
+        # parsed JSON fields.
+        reference = data.get("reference") or {}
+        steps = "\n".join(f"- {step}" for step in data.get("steps") or [])
+        sections = [
+            f"**Suggested Approach:**\n{data.get('suggested_approach', '')}",
+            f"**Possible Steps to Try:**\n{steps}",
+            f"**Confidence:** {data.get('confidence', 'Unknown')} — "
+            f"{data.get('confidence_reason', '')}",
+            f"**Reference:** Ticket {reference.get('ticket_id', 'N/A')} "
+            f"({reference.get('date', 'N/A')}) handled by "
+            f"{reference.get('agent_name', 'N/A')}",
+        ]
+        if data.get("other_approaches"):
+            sections.append(
+                f"**Other Relevant Approaches:**\n{data['other_approaches']}"
+            )
+        return "\n\n".join(sections)
     
     @staticmethod
     def _prepare_candidates(
-        similar_tickets: List[Dict[str, Any]]
+        similar_tickets: List[Dict[str, Any]],
+        max_candidates: int = MAX_PROMPT_CANDIDATES
     ) -> List[Dict[str, Any]]:
         candidates = []
         
@@ -91,29 +492,57 @@ class TicketResolutionAssistant:
                 ),
                 "score": ticket.get("score", 0.0),
             }
-            
-            candidate["_parsed_date"] = TicketResolutionAssistant._parse_date(
-                candidate["date"]
-            )
-            
+
+            candidate["_badge"] = TicketResolutionAssistant._STATUS_BADGES[
+                candidate["resolved"]
+            ]
+            # No _parsed_date here: nothing in the pipeline or the client
+            # reads it; callers that need a datetime can run _parse_date on
+            # the raw "date" field themselves.
+
             candidates.append(candidate)
-        
-        candidates.sort(key=lambda c: c["score"], reverse=True)
-        
-        return candidates
+
+        if len(candidates) > 64:
+            # One C-level argsort over a float array beats the per-element
+            # key calls of list.sort on big batch jobs; scores are already
+            # cosine similarities, so no normalization pass is needed.
+            scores = np.fromiter(
+                (c["score"] for c in candidates), dtype="float64",
+                count=len(candidates),
+            )
+            order = np.argsort(-scores, kind="stable")
+            candidates = [candidates[i] for i in order]
+        else:
+            candidates.sort(key=lambda c: c["score"], reverse=True)
+
+        # Truncate after sorting so only the best candidates spend prompt
+        # tokens.
+        return candidates[:max_candidates]
     
+    _RESOLVED_LOOKUP = {
+        "true": True,
+        "false": False,
+        "yes": True,
+        "no": False,
+        "1": True,
+        "0": False,
+        "1.0": True,
+        "0.0": False,
+    }
+
     @staticmethod
     def _parse_resolved(value: str) -> Optional[bool]:
         if not value:
             return None
-        
+
         s = str(value).strip().lower()
-        
-        if s == "true":
-            return True
-        if s == "false":
-            return False
-        
+
+        # Single dict probe covers every value the ticket exports actually
+        # contain; the float() fallback only runs for oddballs.
+        result = TicketResolutionAssistant._RESOLVED_LOOKUP.get(s)
+        if result is not None:
+            return result
+
         try:
             return bool(float(s))
         except Exception:
@@ -121,192 +550,54 @@ class TicketResolutionAssistant:
     
     @staticmethod
     def _parse_date(date_str: str) -> Optional[datetime]:
+        # Hand-rolled mm/dd/yyyy parse; strptime re-interprets its format
+        # string on every call and is ~10x slower for a fixed layout.
         if not date_str:
             return None
-    
+
+        parts = date_str.split("/")
+        if len(parts) != 3:
+            return None
+
         try:
-            return datetime.strptime(date_str, "%m/%d/%Y")
-        except Exception:
+            month, day, year = int(parts[0]), int(parts[1]), int(parts[2])
+            return datetime(year, month, day)
+        except ValueError:
             return None
     
+    _STATUS_BADGES = {
+        True: None,
+        False: "Attempted (Not Confirmed) — solution may be incomplete.",
+        None: "Unknown resolution status.",
+    }
+
     @staticmethod
     def _get_status_badge(resolved: Optional[bool]) -> Optional[str]:
-        if resolved is True:
-            return None
-        elif resolved is False:
-            return "Attempted (Not Confirmed) — solution may be incomplete."
-        else:
-            return "Unknown resolution status."
+        return TicketResolutionAssistant._STATUS_BADGES[resolved]
 
     @staticmethod
     def _build_system_prompt() -> str:
-        return (
-            "You are an IT support assistant helping agents find relevant approaches to solve tickets. "
-            "Your role is to analyze historical tickets and suggest possible scenarios and approaches, NOT to provide definitive solutions.\n\n"
-            
-            "PRIORITIZATION LOGIC:\n"
-            "When analyzing tickets, think in this order:\n"
-            "1. SEMANTIC SIMILARITY: Which tickets are most similar to the current issue? (highest scores)\n"
-            "2. RESOLUTION STATUS: Among similar tickets, prioritize resolved ones over unresolved\n"
-            "3. RECENCY: If similarity and status are comparable, prefer more recent tickets\n\n"
-            
-            "IMPORTANT SCENARIO:\n"
-            "If ticket A has 99% similarity but is unresolved, and ticket B has 98% similarity but is resolved:\n"
-            "→ Prioritize ticket B (resolved) as the main suggestion\n"
-            "→ Still mention ticket A's approach, but note: 'This approach was attempted but resolution not confirmed'\n\n"
-            
-            "OUTPUT FORMAT:\n"
-            "Structure your response as helpful suggestions:\n\n"
-            
-            "**Suggested Approach:**\n"
-            "(Present the most relevant resolved ticket's approach in 1-2 sentences. Use language like "
-            "\"Based on similar cases, you might consider...\" or \"A successful approach has been...\")\n\n"
-            
-            "**Possible Steps to Try:**\n"
-            "- (2-3 concrete steps from the historical resolution)\n"
-            "- (Focus on what worked before, not as commands but as suggestions)\n\n"
-            
-            "**Confidence:** [Low/Medium/High] — (explain why based on similarity score and ticket quality)\n\n"
-            
-            "**Reference:** Ticket [ID] (Date) handled by [Agent Name]\n\n"
-            
-            "**Other Relevant Approaches:**\n"
-            "(If applicable: mention alternative approaches, unresolved attempts with caveats, or related scenarios)\n\n"
-            
-            "---\n\n"
-            "EXAMPLES:\n\n"
-            
-            "Example 1 — Clear Match with High Confidence:\n\n"
-            "INCOMING TICKET:\n"
-            "User reports VPN connection keeps timing out after a few minutes\n\n"
-            "HISTORICAL CANDIDATE TICKETS:\n\n"
-            "1) Ticket: TCKT-1234 | Similarity: 0.9245 | Date: 01/15/2024 | Resolved: True | Category: Network | "
-            "Agent: Sarah Chen | Problem: Issue: VPN disconnects frequently - Description: User's VPN connection times out "
-            "every 5-10 minutes during work hours. | Resolution: Reinstalled VPN client and updated security certificates. "
-            "\n\n"
-            
-            "2) Ticket: TCKT-1189 | Similarity: 0.8712 | Date: 01/08/2024 | Resolved: True | Category: Network | "
-            "Agent: Mike Torres | Problem: Issue: VPN connection unstable - Description: VPN drops connection randomly. | "
-            "Resolution: Reset network adapter settings and reconnected.\n\n"
-            
-            "YOUR RESPONSE:\n"
-            "**Suggested Approach:**\n"
-            "Based on a very similar case from January, reinstalling the VPN client and updating security certificates successfully "
-            "resolved recurring timeout issues.\n\n"
-            
-            "**Possible Steps to Try:**\n"
-            "- Uninstall and reinstall the VPN client software\n"
-            "- Request updated security certificates from IT security team\n"
-            "- Test connection stability after both updates\n\n"
-            
-            "**Confidence:** High — Strong semantic match (0.92) with confirmed resolution for nearly identical symptoms\n\n"
-            
-            "**Reference:** Ticket TCKT-1234 (01/15/2024) handled by Sarah Chen\n\n"
-            "**Other Relevant Approaches:**\n"
-            "Another resolved case (TCKT-1189) had success with resetting network adapter settings, though that was for less "
-            "frequent disconnections.\n\n"
-            
-            "---\n\n"
-            
-            "Example 2 — High Score Unresolved vs Lower Score Resolved (Prioritize Resolved):\n\n"
-            "INCOMING TICKET:\n"
-            "Office printer not connecting to WiFi network\n\n"
-            "HISTORICAL CANDIDATE TICKETS:\n\n"
-            "1) Ticket: TCKT-5001 | Similarity: 0.9511 | Date: 02/20/2024 | Resolved: False | Category: Hardware | "
-            "Agent: Alex Kumar | Problem: Issue: Printer won't connect to WiFi - Description: Office printer cannot connect "
-            "to wireless network, shows error on display. | Resolution: Reset network settings on printer and restarted router. "
-            "Waiting for user confirmation.\n\n"
-            
-            "2) Ticket: TCKT-4989 | Similarity: 0.8834 | Date: 02/10/2024 | Resolved: True | Category: Hardware | "
-            "Agent: Mike Torres | Problem: Issue: WiFi printer connectivity issue - Description: Printer unable to maintain "
-            "WiFi connection. | Resolution: Updated printer firmware to latest version. Issue resolved.\n\n"
-            
-            "YOUR RESPONSE:\n"
-            "**Suggested Approach:**\n"
-            "The most successful resolution for similar printer WiFi connectivity issues involved updating the printer firmware "
-            "to the latest version, which fully resolved the connection problems.\n\n"
-            
-            "**Possible Steps to Try:**\n"
-            "- Check the printer's current firmware version (usually in Settings menu)\n"
-            "- Download the latest firmware from the manufacturer's website\n"
-            "- Apply firmware update via printer control panel or web interface\n\n"
-            
-            "**Confidence:** Medium — Good semantic match (0.88) with confirmed fix, though a more similar case exists with "
-            "unconfirmed resolution\n\n"
-            
-            "**Reference:** Ticket TCKT-4989 (02/10/2024) handled by Mike Torres\n\n"
-            
-            "**Other Relevant Approaches:**\n"
-            "A more recent and highly similar ticket (TCKT-5001, 0.95 similarity) attempted resetting network settings and "
-            "restarting the router, but this approach hasn't been confirmed to work as the ticket remains unresolved. You might "
-            "consider this as a secondary option if firmware update doesn't resolve the issue.\n\n"
-            
-            "---\n\n"
-            
-            "Example 3 — Low Confidence Match:\n\n"
-            "INCOMING TICKET:\n"
-            "Application crashes immediately on startup, no error message displayed\n\n"
-            "HISTORICAL CANDIDATE TICKETS:\n\n"
-            "1) Ticket: TCKT-3333 | Similarity: 0.5847 | Date: 01/05/2024 | Resolved: True | Category: Software | "
-            "Agent: Sarah Chen | Problem: Issue: Software running slow - Description: Application takes long time to start "
-            "and runs sluggishly. | Resolution: Cleared application cache and temporary files. Performance improved.\n\n"
-            
-            "2) Ticket: TCKT-3290 | Similarity: 0.5623 | Date: 12/28/2023 | Resolved: True | Category: Software | "
-            "Agent: Alex Kumar | Problem: Issue: Program won't launch - Description: Software fails to open, freezes on "
-            "splash screen. | Resolution: Reinstalled the application.\n\n"
-            
-            "YOUR RESPONSE:\n"
-            "**Suggested Approach:**\n"
-            "The most related cases found had different symptoms, but you might start with clearing application cache and "
-            "temporary files, which has resolved some software startup issues in the past.\n\n"
-            
-            "**Possible Steps to Try:**\n"
-            "- Clear application cache and temporary files\n"
-            "- Try launching the application after restart\n"
-            "- If problem persists, consider reinstalling the application\n\n"
-            
-            "**Confidence:** Low — Limited semantic similarity (0.58) suggests this may be a different root cause. The matched "
-            "tickets had different symptoms (slow performance vs immediate crash), so this solution might not be effective.\n\n"
-            
-            "**Reference:** Ticket TCKT-3333 (01/05/2024) handled by Sarah Chen\n\n"
-            
-            "**Other Relevant Approaches:**\n"
-            "Given the low confidence, consider escalating to senior support or checking application logs for specific error "
-            "codes that could point to the actual cause.\n\n"
-            
-            "---\n\n"
-            "Remember: Ground the agent in what has worked before, but present it as suggested approaches, not absolute solutions. "
-            "Always indicate when an approach is unconfirmed. Be honest about confidence levels."
-        )
+        if LLM_STRUCTURED_OUTPUT:
+            return _STRUCTURED_SYSTEM_PROMPT
+        return _SYSTEM_PROMPT
     
     @staticmethod
     def _build_user_prompt(
         query: str,
         candidates: List[Dict[str, Any]]
     ) -> str:
-        lines = [
-            f"INCOMING TICKET:\n{query}\n",
-            "\nHISTORICAL CANDIDATE TICKETS (sorted by relevancy):\n"
-        ]
-        
+        # StringIO grows one buffer in place, so the prompt is assembled
+        # without the intermediate list + join copy.
+        buf = io.StringIO()
+        buf.write(f"INCOMING TICKET:\n{query}\n\n")
+        buf.write("\nHISTORICAL CANDIDATE TICKETS (sorted by relevancy):\n")
+
         for i, candidate in enumerate(candidates, start=1):
-            lines.append(
-                f"\n{i}) Ticket: {candidate.get('ticket_id', 'N/A')} | "
-                f"Similarity: {candidate.get('score', 0):.4f} | "
-                f"Date: {candidate.get('date', 'N/A')} | "
-                f"Resolved: {candidate.get('resolved', 'Unknown')} | "
-                f"Category: {candidate.get('category', 'N/A')} | "
-                f"Agent: {candidate.get('agent_name', 'N/A')} | "
-                f"Problem: {candidate.get('problem', '')} | "
-                f"Resolution: {candidate.get('resolution', '')}"
-            )
-                    
-        lines.append(
-            "\n" + "="*70 + "\n"
-            "ANALYZE the tickets above using the system instructions.\n"
-            "Consider similarity scores, resolved status, and dates.\n"
-            "Provide your recommendation in the structured format specified."
-        )
-        
-        return "\n".join(lines)
+            buf.write(_CANDIDATE_ROW_TEMPLATE.format_map(
+                {**_CANDIDATE_ROW_DEFAULTS, **candidate, "i": i}
+            ))
+
+        buf.write(_USER_PROMPT_FOOTER)
+
+        return buf.getvalue()
 
@@ -0,0 +1,97 @@
+import atexit
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any
+
+from src.config import (
+    LLM_TELEMETRY,
+    LLM_TELEMETRY_PATH,
+    LLM_TELEMETRY_BATCH_SIZE,
+    LLM_TELEMETRY_FLUSH_INTERVAL,
+)
+from src.json_io import json_dumps
+
+
+class TelemetryLogger:
+    """Batched, non-blocking event logging.
+
+    record() just enqueues; a daemon thread drains the queue in batches
+    (up to batch_size events or flush_interval seconds) and appends them
+    to a JSONL file in one buffered write, so callers never wait on disk.
+    Remaining events are flushed at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        path: Path = LLM_TELEMETRY_PATH,
+        enabled: bool = LLM_TELEMETRY,
+        batch_size: int = LLM_TELEMETRY_BATCH_SIZE,
+        flush_interval: float = LLM_TELEMETRY_FLUSH_INTERVAL
+    ):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record(self, event: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+
+        event.setdefault("ts", time.time())
+        self._ensure_thread()
+        self._queue.put(event)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    thread = threading.Thread(target=self._run, daemon=True)
+                    thread.start()
+                    self._thread = thread
+                    atexit.register(self._drain)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            self._write(batch)
+
+    def _drain(self) -> None:
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                for event in batch:
+                    f.write(json_dumps(event))
+                    f.write(b"\n")
+        except Exception:
+            # Telemetry must never take a request down with it.
+            pass
+
+
+telemetry = TelemetryLogger()